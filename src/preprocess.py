@@ -12,10 +12,13 @@ The output dataset is used for mapper graph construction to identify structural
 relationships between fight songs based on lyrical and musical characteristics.
 """
 
+import hashlib
 import os
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 
 # Historical win percentage data (all-time records)
 # Source: https://en.wikipedia.org/wiki/Big_Ten_Conference#All-time_school_records
@@ -26,30 +29,124 @@ WIN_PERC = {
     'Rutgers': 0.491, 'Northwestern': 0.448, 'Indiana': 0.421
 }
 
+# Pac-12 schools that joined the Big Ten in the 2024 conference expansion
+SCHOOLS_TO_REMAP = ['USC', 'UCLA', 'Oregon', 'Washington']
 
-def normalize_to_1_10(values: pd.Series) -> pd.Series:
+# Bytes parsed per streamed CSV batch; bounds memory use if the source dataset grows
+CSV_BLOCK_SIZE = 1 << 20
+
+# Explicit column types for the streamed reader, which otherwise infers types from the first
+# block alone; free-text columns such as year ('Unknown') would then fail to convert in later blocks
+NUMERIC_COLUMNS = ['bpm', 'sec_duration', 'number_fights', 'trope_count']
+TEXT_COLUMNS = [
+    'school', 'conference', 'song_name', 'writers', 'year', 'student_writer', 'official_song',
+    'contest', 'fight', 'victory', 'win_won', 'victory_win_won', 'rah', 'nonsense', 'colors',
+    'men', 'opponents', 'spelling', 'spotify_id'
+]
+CSV_COLUMN_TYPES = {
+    **{column: pa.int64() for column in NUMERIC_COLUMNS},
+    **{column: pa.string() for column in TEXT_COLUMNS},
+}
+
+# Lookup table built once so the join runs in pandas' merge path rather than per-row dict lookups
+WIN_PERC_DF = pd.DataFrame({'school': list(WIN_PERC), 'win_perc': list(WIN_PERC.values())})
+
+
+def normalize_to_1_10(values: np.ndarray) -> np.ndarray:
     """
-    Normalize a pandas Series to a 1-10 scale using min-max normalization.
+    Normalize values to a 1-10 scale using column-wise min-max normalization.
     
     This normalization ensures all engineered features are on a consistent scale
     for topological data analysis, where feature magnitude differences can affect
     distance calculations in high-dimensional space.
     
     Args:
-        values: Pandas Series of numeric values to normalize
+        values: Array of shape (N,) or (N, k); each column is normalized independently
         
     Returns:
-        Pandas Series with values normalized to 1-10 range
+        Float64 array of the same shape with values normalized to 1-10 range
     """
-    min_val = values.min()
-    max_val = values.max()
+    arr = np.asarray(values, dtype=np.float64)
+    # Min/max reductions are undefined on zero rows; there is nothing to normalize
+    if arr.shape[0] == 0:
+        return arr
+    # NaN-skipping reductions so a missing value only leaves its own row unnormalized
+    min_val = np.nanmin(arr, axis=0)
+    value_range = np.nanmax(arr, axis=0) - min_val
+    constant = value_range == 0
+
+    # Constant columns take the midpoint value; their range is replaced to avoid division by zero
+    scale = 9.0 / np.where(constant, 1.0, value_range)
+    return np.where(constant, 5.5, 1.0 + (arr - min_val) * scale)
+
+def engineer_features(number_fights: np.ndarray, victory_yes: np.ndarray,
+                      sec_duration: np.ndarray, bpm: np.ndarray) -> np.ndarray:
+    """
+    Compute the normalized engineered features in a single fused pass.
     
-    # Return midpoint value when all inputs are identical to avoid division by zero
-    if max_val == min_val:
-        return pd.Series([5.5] * len(values), index=values.index)
+    Stacking the raw inputs into one matrix lets all features share a single
+    min-max normalization instead of one pandas round trip per feature.
     
-    normalized = 1 + ((values - min_val) / (max_val - min_val)) * 9
-    return normalized
+    Args:
+        number_fights: Count of "fight" occurrences in each song
+        victory_yes: 1 where the song uses victory language, otherwise 0
+        sec_duration: Song duration in seconds
+        bpm: Song tempo in beats per minute
+        
+    Returns:
+        Array of shape (N, 3) holding aggression, complexity, and energy scores
+    """
+    raw = np.column_stack((
+        # Aggression Score: Composite metric weighting fight frequency and victory language
+        number_fights * 2 + victory_yes,
+        # Complexity Score: Duration as proxy for compositional complexity
+        sec_duration,
+        # Energy Score: Tempo (BPM) measures musical energy
+        bpm,
+    ))
+    return normalize_to_1_10(raw)
+
+def select_big_ten(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Remap expanded conference affiliations and keep only Big Ten schools.
+    
+    Applied per streamed batch so that non-Big Ten rows are discarded before the
+    full dataset is ever materialized.
+    
+    Args:
+        chunk: Batch of rows from the original FiveThirtyEight dataset
+        
+    Returns:
+        Rows belonging to the Big Ten after the 2024 expansion
+    """
+    # Raw arrays bypass the .loc indexer and its label alignment
+    school = chunk['school'].to_numpy()
+    conference = chunk['conference'].to_numpy()
+    remap = np.isin(school, SCHOOLS_TO_REMAP) & (conference == 'Pac-12')
+    conference = np.where(remap, 'Big Ten', conference)
+    chunk['conference'] = pd.array(conference, dtype=chunk['conference'].dtype)
+    return chunk[conference == 'Big Ten']
+
+def compute_cache_key(*paths: str) -> str:
+    """
+    Compute a content fingerprint over the given files.
+
+    Hashing both the source dataset and this script means the cached output is
+    invalidated whenever either the input data or the processing logic changes.
+
+    Args:
+        paths: File paths whose contents contribute to the fingerprint
+
+    Returns:
+        Hexadecimal BLAKE2b digest of the concatenated file contents
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, 'rb') as f:
+            # Hash in blocks so the source dataset is never loaded into memory whole
+            for block in iter(lambda: f.read(CSV_BLOCK_SIZE), b''):
+                digest.update(block)
+    return digest.hexdigest()
 
 def main() -> None:
     """
@@ -61,23 +158,51 @@ def main() -> None:
     a separate file to maintain data integrity.
     """
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    source_path = os.path.join(base_dir, 'data', 'fight-songs.csv')
+    output_path = os.path.join(base_dir, 'data', 'processed_fight_songs.parquet')
+    cache_key_path = os.path.join(base_dir, 'data', '.processed_fight_songs.cache_key')
+    
+    # Skip the pipeline entirely when neither the input data nor this script has changed
+    cache_key = compute_cache_key(source_path, os.path.abspath(__file__))
+    if os.path.exists(output_path) and os.path.exists(cache_key_path):
+        with open(cache_key_path, 'r', encoding='utf-8') as f:
+            if f.read().strip() == cache_key:
+                print("Processed data is up to date; skipping preprocessing.")
+                return
+    
+    print("Loading fight-songs.csv and filtering to Big Ten conference...")
+    # Stream the CSV through PyArrow's reader (pandas' pyarrow engine does not support chunksize)
+    # and update conference affiliations per batch to reflect the 2024 Big Ten expansion
+    reader = pa_csv.open_csv(
+        source_path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(column_types=CSV_COLUMN_TYPES)
+    )
+    # Empty frame with the source schema keeps the concatenation valid when the CSV has no data rows
+    empty = reader.schema.empty_table().to_pandas(types_mapper=pd.ArrowDtype)
+    df_big10 = pd.concat(
+        [empty, *(select_big_ten(batch.to_pandas(types_mapper=pd.ArrowDtype)) for batch in reader)],
+        ignore_index=True
+    )
     
-    print("Loading fight-songs.csv...")
-    df = pd.read_csv(os.path.join(base_dir, 'data', 'fight-songs.csv'))
-    
-    # Update conference affiliations to reflect 2024 Big Ten expansion
-    print("Remapping conferences...")
-    schools_to_remap = ['USC', 'UCLA', 'Oregon', 'Washington']
-    df.loc[df['school'].isin(schools_to_remap) & (df['conference'] == 'Pac-12'), 'conference'] = 'Big Ten'
+    print(f"Found {len(df_big10)} Big Ten schools")
     
-    print("Filtering to Big Ten conference...")
-    df_big10 = df[df['conference'] == 'Big Ten'].copy()
+    # Feature normalization and the mapper graph are undefined without any schools
+    if df_big10.empty:
+        raise ValueError(f"No Big Ten schools found in {source_path}")
     
-    print(f"Found {len(df_big10)} Big Ten schools")
+    # Yes/No flag stored as a compact categorical; the victory-language test below compares its codes.
+    # Cast once after concatenation because per-batch categories would not align across batches
+    df_big10['victory_win_won'] = df_big10['victory_win_won'].astype('category')
     
     # Add win percentages (required for "Winning Manifold" identification in TDA)
     print("Adding win percentages...")
-    df_big10['win_perc'] = df_big10['school'].map(WIN_PERC)
+    # The lookup key must share the frame's category dtype: merging against a plain string key
+    # decays school back to strings, so the join would neither run on codes nor stay categorical
+    df_big10['school'] = df_big10['school'].astype('category')
+    school_dtype = df_big10['school'].dtype
+    win_perc_df = WIN_PERC_DF[WIN_PERC_DF['school'].isin(school_dtype.categories)].astype({'school': school_dtype})
+    df_big10 = df_big10.merge(win_perc_df, on='school', how='left')
     
     missing = df_big10[df_big10['win_perc'].isna()]
     if len(missing) > 0:
@@ -89,24 +214,26 @@ def main() -> None:
     # Cliché Score: Lyrical conventionality (trope_count)
     df_big10['cliche_score'] = df_big10['trope_count']
     
-    # Aggression Score: Composite metric weighting fight frequency and victory language
-    df_big10['aggression_score'] = (df_big10['number_fights'] * 2) + \
-                                    df_big10['victory_win_won'].apply(lambda x: 1 if x == 'Yes' else 0)
-    df_big10['aggression_score'] = normalize_to_1_10(df_big10['aggression_score'])
-    
-    # Complexity Score: Duration as proxy for compositional complexity
-    df_big10['complexity_score'] = normalize_to_1_10(df_big10['sec_duration'])
-    
-    # Energy Score: Tempo (BPM) measures musical energy
-    df_big10['energy_score'] = normalize_to_1_10(df_big10['bpm'])
+    # Aggression, complexity, and energy scores share one fused normalization pass
+    victory_yes = (df_big10['victory_win_won'] == 'Yes').to_numpy(dtype=np.int8)
+    df_big10[['aggression_score', 'complexity_score', 'energy_score']] = engineer_features(
+        df_big10['number_fights'].to_numpy(),
+        victory_yes,
+        df_big10['sec_duration'].to_numpy(),
+        df_big10['bpm'].to_numpy(),
+    )
     
     print("Saving processed data...")
-    df_big10.to_csv(os.path.join(base_dir, 'data', 'processed_fight_songs.csv'), index=False)
+    # Parquet keeps column dtypes and avoids stringifying every float for the downstream reader
+    df_big10.to_parquet(output_path, index=False, compression='zstd')
+    
+    with open(cache_key_path, 'w', encoding='utf-8') as f:
+        f.write(cache_key)
     
     print(f"\nProcessing complete!")
-    print(f"Saved {len(df_big10)} Big Ten schools to data/processed_fight_songs.csv")
+    print(f"Saved {len(df_big10)} Big Ten schools to data/processed_fight_songs.parquet")
     print(f"\nSchools included:")
-    for school in sorted(df_big10['school'].tolist()):
+    for school in np.sort(df_big10['school'].to_numpy()):
         print(f"  - {school}")
 
 if __name__ == '__main__':